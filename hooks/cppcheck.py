@@ -2,6 +2,7 @@
 """Wrapper script for cppcheck."""
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from hooks.utils import StaticAnalyzerCmd
@@ -27,20 +28,63 @@ class CppcheckCmd(StaticAnalyzerCmd):
             ["--suppress=unmatchedSuppression", "--suppress=missingIncludeSystem", "--suppress=unusedFunction"]
         )
         self.apply_cppcheck_config()
+        self.jobs = self.parse_jobs()
+        self.make_build_dir()
 
     def run(self):
-        """Run cppcheck"""
-        # if len(self.files) > 1:
-        #     self.files = ["firmware/src"]
-        # print("Running command with args: " + " ".join(self.args + self.files))
-        # self.run_command(self.args + self.files)
-        # self.exit_on_error()
+        """Run cppcheck once on all files so that startup cost is only paid once.
+        Set CPPCHECK_HOOK_PER_FILE=1 to run cppcheck separately on each file instead."""
         print(f"Running in directory: {os.getcwd()}")
-
-        for filename in self.files:
-            self.run_command([filename] + self.args)
+        if os.environ.get("CPPCHECK_HOOK_PER_FILE") == "1":
+            self.run_per_file()
+        elif self.files:
+            # cppcheck will split the files between its own processes
+            jobs_args = [f"-j{self.jobs}"] if self.jobs > 1 and len(self.files) > 1 else []
+            self.run_command(self.files + self.args + jobs_args)
         self.exit_on_error()
 
+    def run_per_file(self) -> None:
+        """Run cppcheck on each file in parallel.
+        Output is added in file order so that it is the same as a serial run."""
+        # Build every command line up front so worker threads don't read self.args
+        args = tuple(self.args)
+        file_args = [[filename, *args] for filename in self.files]
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            children = list(executor.map(self.get_output, file_args))
+        for sp_child in children:
+            self.add_output(sp_child)
+
+    def make_build_dir(self) -> None:
+        """cppcheck reuses the results for unchanged files from the last run if --cppcheck-build-dir is used,
+        but fails if the directory does not exist yet, so create it."""
+        for arg in self.args:
+            if arg.startswith("--cppcheck-build-dir="):
+                build_dir = arg.split("=", 1)[1]
+                if not build_dir:
+                    self.raise_error("Invalid cppcheck build dir", "Expected a directory after --cppcheck-build-dir=.")
+                os.makedirs(build_dir, exist_ok=True)
+
+    def parse_jobs(self) -> int:
+        """Remove -j<N> or -j <N> from args and return N, defaulting to the number of CPUs.
+        Use -j1 to check files one at a time. -j is passed on to cppcheck unless running per file."""
+        jobs = os.cpu_count() or 1
+        for i, arg in enumerate(self.args):
+            if arg.startswith("-j"):
+                jobs_str = arg[2:]
+                jobs_args = [arg]
+                # If -j is passed in as 2 arguments, where the second is the number of jobs
+                if jobs_str == "" and i + 1 < len(self.args):
+                    jobs_str = self.args[i + 1]
+                    jobs_args.append(jobs_str)
+                if not jobs_str.isdigit() or int(jobs_str) < 1:
+                    details = f"Expected a positive integer after -j, got `{jobs_str}`."
+                    self.raise_error("Invalid number of jobs", details)
+                # Remove by position as N may also be the value of another option
+                del self.args[i : i + len(jobs_args)]
+                jobs = int(jobs_str)
+                break
+        return jobs
+
 
 def main(argv: List[str] = sys.argv):
     cmd = CppcheckCmd(argv)
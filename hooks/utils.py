@@ -197,8 +197,14 @@ class StaticAnalyzerCmd(Command):
 
     def run_command(self, args: List[str]):
         """Run the command and check for errors. Args includes options and filepaths"""
-        args = [self.command, *args]
-        sp_child = sp.run(args, stdout=sp.PIPE, stderr=sp.PIPE)
+        self.add_output(self.get_output(args))
+
+    def get_output(self, args: List[str]) -> "sp.CompletedProcess[bytes]":
+        """Run the command without touching stdout/stderr/returncode so it can be called from multiple threads."""
+        return sp.run([self.command, *args], stdout=sp.PIPE, stderr=sp.PIPE)
+
+    def add_output(self, sp_child: "sp.CompletedProcess[bytes]") -> None:
+        """Add the output of a finished command, keeping the first nonzero return code."""
         self.stdout += sp_child.stdout
         self.stderr += sp_child.stderr
         if self.returncode == 0:
@@ -0,0 +1,175 @@
+"""Test how the cppcheck hook handles -j and running on each file"""
+import os
+import subprocess as sp
+import sys
+import time
+
+import pytest
+
+from hooks.cppcheck import CppcheckCmd
+
+_TEST_REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_repo")
+_FILES = [os.path.join(_TEST_REPO_DIR, filename) for filename in ["ok.c", "err.c", "ok.cpp"]]
+
+
+def make_cmd(monkeypatch, args):
+    """Create the command as pre-commit would, with the files in sys.argv"""
+    argv = ["cppcheck-hook", *_FILES, *args]
+    monkeypatch.setattr(sys, "argv", argv)
+    return CppcheckCmd(argv)
+
+
+class TestCppcheckJobs:
+    """Test that -j<N> and -j <N> are parsed and removed from the args"""
+
+    @classmethod
+    def setup_class(cls):
+        """Setup the scenario list"""
+        cls.scenarios = [
+            ["-j2", {"args": ["-j2"], "expd_jobs": 2, "expd_args": []}],
+            ["-j 3", {"args": ["-j", "3"], "expd_jobs": 3, "expd_args": []}],
+            [
+                "-j1 with other args",
+                {
+                    "args": ["--std=c99", "-j1", "--inline-suppr"],
+                    "expd_jobs": 1,
+                    "expd_args": ["--std=c99", "--inline-suppr"],
+                },
+            ],
+            [
+                "-j 4 after -l 4",
+                {
+                    "args": ["-l", "4", "--inline-suppr", "-j", "4"],
+                    "expd_jobs": 4,
+                    "expd_args": ["-l", "4", "--inline-suppr"],
+                },
+            ],
+            ["default", {"args": [], "expd_jobs": os.cpu_count() or 1, "expd_args": []}],
+        ]
+
+    @staticmethod
+    def test_parse_jobs(args, expd_jobs, expd_args, monkeypatch):
+        cmd = make_cmd(monkeypatch, args)
+        assert cmd.jobs == expd_jobs
+        # Defaults added by the hook come after the user's args
+        assert cmd.args[: len(expd_args)] == expd_args
+        assert not any(arg.startswith("-j") for arg in cmd.args)
+        assert cmd.files == _FILES
+
+    @staticmethod
+    def test_jobs_in_config_file(args, expd_jobs, expd_args, monkeypatch, tmp_path):
+        """-j in the args of a --config-file is parsed the same way"""
+        config_file = tmp_path / "cppcheck.yaml"
+        config_file.write_text("args: [{}]\n".format(", ".join(f'"{arg}"' for arg in args)))
+        cmd = make_cmd(monkeypatch, [f"--config-file={config_file}"])
+        assert cmd.jobs == expd_jobs
+        # Args from the config file are added last
+        assert cmd.args[len(cmd.args) - len(expd_args) :] == expd_args
+        assert not any(arg.startswith("-j") for arg in cmd.args)
+
+
+class TestCppcheckBadJobs:
+    """Test that the hook exits if the number of jobs is not a positive integer"""
+
+    @classmethod
+    def setup_class(cls):
+        """Setup the scenario list"""
+        cls.scenarios = [
+            ["-j", {"args": ["-j"]}],
+            ["-j0", {"args": ["-j0"]}],
+            ["-jx", {"args": ["-jx"]}],
+        ]
+
+    @staticmethod
+    def test_bad_jobs(args, monkeypatch):
+        with pytest.raises(SystemExit):
+            make_cmd(monkeypatch, args)
+
+
+class TestCppcheckPerFile:
+    """Test that CPPCHECK_HOOK_PER_FILE=1 runs cppcheck on each file and keeps the output in file order"""
+
+    @classmethod
+    def setup_class(cls):
+        """Setup the scenario list"""
+        cls.scenarios = [
+            ["-j1", {"args": ["-j1"]}],
+            ["-j3", {"args": ["-j3"]}],
+        ]
+
+    @staticmethod
+    def test_run_per_file(args, monkeypatch):
+        cmd = make_cmd(monkeypatch, args)
+        calls = []
+
+        def get_output(cmd_args):
+            calls.append(cmd_args)
+            # Make the first file finish last so that out of order output would show
+            time.sleep(0.1 if cmd_args[0] == _FILES[0] else 0)
+            return sp.CompletedProcess(cmd_args, 0, stdout=cmd_args[0].encode() + b"\n", stderr=b"")
+
+        monkeypatch.setattr(cmd, "get_output", get_output)
+        monkeypatch.setenv("CPPCHECK_HOOK_PER_FILE", "1")
+        cmd.run()
+        assert sorted(call[0] for call in calls) == sorted(_FILES)
+        assert all(call[1:] == cmd.args for call in calls)
+        assert cmd.stdout == b"".join(filename.encode() + b"\n" for filename in _FILES)
+        assert cmd.returncode == 0
+
+
+class TestCppcheckOneCommand:
+    """Test that cppcheck is run once on all files, passing -j on to cppcheck"""
+
+    @classmethod
+    def setup_class(cls):
+        """Setup the scenario list"""
+        cls.scenarios = [
+            ["-j1", {"args": ["-j1"], "expd_jobs_args": []}],
+            ["-j3", {"args": ["-j3"], "expd_jobs_args": ["-j3"]}],
+        ]
+
+    @staticmethod
+    def test_run_one_command(args, expd_jobs_args, monkeypatch):
+        cmd = make_cmd(monkeypatch, args)
+        calls = []
+
+        def get_output(cmd_args):
+            calls.append(cmd_args)
+            return sp.CompletedProcess(cmd_args, 0, stdout=b"", stderr=b"")
+
+        monkeypatch.setattr(cmd, "get_output", get_output)
+        monkeypatch.delenv("CPPCHECK_HOOK_PER_FILE", raising=False)
+        cmd.run()
+        assert calls == [_FILES + cmd.args + expd_jobs_args]
+
+
+class TestCppcheckBuildDir:
+    """Test that the --cppcheck-build-dir directory is created"""
+
+    @classmethod
+    def setup_class(cls):
+        """Setup the scenario list"""
+        cls.scenarios = [
+            ["new dir", {"build_dir": os.path.join("cppcheck", "build")}],
+            ["existing dir", {"build_dir": ""}],
+        ]
+
+    @staticmethod
+    def test_make_build_dir(build_dir, monkeypatch, tmp_path):
+        build_path = tmp_path / build_dir
+        make_cmd(monkeypatch, [f"--cppcheck-build-dir={build_path}"])
+        assert build_path.is_dir()
+
+
+class TestCppcheckBadBuildDir:
+    """Test that the hook exits if --cppcheck-build-dir has no directory"""
+
+    @classmethod
+    def setup_class(cls):
+        """Setup the scenario list"""
+        cls.scenarios = [["empty", {"args": ["--cppcheck-build-dir="]}]]
+
+    @staticmethod
+    def test_bad_build_dir(args, monkeypatch):
+        with pytest.raises(SystemExit):
+            make_cmd(monkeypatch, args)
@@ -13,11 +13,13 @@ table tests to be generated and each treated as a test by pytest.
 This allows for 45 tests with a descrition instead of 3 which
 functionally tests the same thing.
 """
+import functools
 import json
 import os
-import re
 import subprocess as sp
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
 
 import tests.test_utils as utils
 from hooks.clang_format import ClangFormatCmd
@@ -28,6 +30,90 @@ from hooks.include_what_you_use import IncludeWhatYouUseCmd
 from hooks.oclint import OCLintCmd
 from hooks.uncrustify import UncrustifyCmd
 
+_CWD = os.getcwd()
+_TEST_REPO_DIR = os.path.join(_CWD, "tests", "test_repo")
+_UNC_DEFAULTS_PATH = os.path.join(_CWD, "tests", "uncrustify_defaults.cfg")
+
+# Expected output templates for err.c and err.cpp
+_CLANG_FORMAT_ERR = """{0}
+====================
+--- original
+
++++ formatted
+
+@@ -1,2 +1,5 @@
+
+ #include {1}
+-int main(){{int i;return;}}
++int main() {{
++  int i;
++  return;
++}}
+"""  # noqa: E501
+
+_CLANG_TIDY_ERR = """{0}:2:18: error: non-void function 'main' should return a value [clang-diagnostic-return-type]
+int main(){{int i;return;}}
+                 ^
+1 error generated.
+Error while processing {0}.
+"""  # noqa: E501
+
+_CPPCHECK_ERR_1_88 = "[{}:1]: (style) Unused variable: i\n"
+
+_CPPCHECK_ERR = """{}:2:16: style: Unused variable: i [unusedVariable]
+int main(){{int i;return;}}
+               ^
+"""
+
+_CPPLINT_ERR = """\
+Done processing {0}
+Total errors found: 5
+{0}:0:  No copyright message found.  You should have a line: "Copyright [year] <Copyright Owner>"  [legal/copyright] [5]
+{0}:2:  More than one command on the same line  [whitespace/newline] [0]
+{0}:2:  Missing space after ;  [whitespace/semicolon] [3]
+{0}:2:  Missing space before {{  [whitespace/braces] [5]
+{0}:2:  Could not find a newline character at the end of the file.  [whitespace/ending_newline] [5]
+"""
+
+_IWYU_ERR = """{0}:2:18: error: non-void function 'main' should return a value [-Wreturn-type]
+int main(){{int i;return;}}
+                 ^
+
+{0} should add these lines:
+
+{0} should remove these lines:
+- #include {1}  // lines 1-1
+
+The full include-list for {0}:
+---
+"""
+
+_OCLINT_ERR = """
+Compiler Errors:
+(please be aware that these errors will prevent OCLint from analyzing this source code)
+
+{0}:2:18: non-void function 'main' should return a value
+
+Clang Static Analyzer Results:
+
+{0}:2:18: non-void function 'main' should return a value
+
+
+OCLint Report
+
+Summary: TotalFiles=0 FilesWithViolations=0 P1=0 P2=0 P3=0{1}
+
+
+[OCLint (http{2}://oclint.org) v{3}]
+"""
+
+
+@functools.lru_cache(maxsize=1)
+def load_integration_tests():
+    """Load the integration table tests that were generated with TestHooks.generate_table_json()."""
+    with open(os.path.join(_CWD, "tests", "table_tests_integration.json")) as f:
+        return json.load(f)
+
 
 class GeneratorT:
     """Generate the test scenarios"""
@@ -47,11 +133,10 @@ class GeneratorT:
         +2x tests:
             * Call the shell hooks installed with pip to mimic end user use
             * Call via importing the command classes to verify expectations"""
-        test_repo_dir = os.path.join(os.getcwd(), "tests", "test_repo")
-        cls.err_c = os.path.join(test_repo_dir, "err.c")
-        cls.err_cpp = os.path.join(test_repo_dir, "err.cpp")
-        cls.ok_c = os.path.join(test_repo_dir, "ok.c")
-        cls.ok_cpp = os.path.join(test_repo_dir, "ok.cpp")
+        cls.err_c = os.path.join(_TEST_REPO_DIR, "err.c")
+        cls.err_cpp = os.path.join(_TEST_REPO_DIR, "err.cpp")
+        cls.ok_c = os.path.join(_TEST_REPO_DIR, "ok.c")
+        cls.ok_cpp = os.path.join(_TEST_REPO_DIR, "ok.cpp")
         cls.files = [cls.ok_c, cls.ok_cpp, cls.err_c, cls.err_cpp]
         cls.retcodes = [0, 0, 1, 1]
 
@@ -71,29 +156,13 @@ class GeneratorT:
     def generate_formatter_tests(cls):
         """Tests for both uncrustify and clang-format. Both should generate the same error output."""
         clang_format_args_sets = [["--style=google"], ["--style=google", "-i"]]
-        clang_format_err = """{0}
-====================
---- original
-
-+++ formatted
-
-@@ -1,2 +1,5 @@
-
- #include {1}
--int main(){{int i;return;}}
-+int main() {{
-+  int i;
-+  return;
-+}}
-"""  # noqa: E501
-        formatter_c_err = clang_format_err.format(cls.err_c, "<stdio.h>").encode()
-        formatter_cpp_err = clang_format_err.format(cls.err_cpp, "<string>").encode()
+        formatter_c_err = _CLANG_FORMAT_ERR.format(cls.err_c, "<stdio.h>").encode()
+        formatter_cpp_err = _CLANG_FORMAT_ERR.format(cls.err_cpp, "<string>").encode()
         formatter_output = [b"", b"", formatter_c_err, formatter_cpp_err]
 
         # Specify config file as autogenerated one varies between uncrustify versions.
         # v0.66 on ubuntu creates an invalid config; v0.68 on osx does not.
-        unc_defaults_path = os.path.join(os.getcwd(), "tests", "uncrustify_defaults.cfg")
-        unc_base_args = ["-c", unc_defaults_path]
+        unc_base_args = ["-c", _UNC_DEFAULTS_PATH]
         unc_addtnl_args = [[], ["--replace", "--no-backup"]]
         uncrustify_arg_sets = [unc_base_args + arg for arg in unc_addtnl_args]
 
@@ -110,10 +179,9 @@ class GeneratorT:
     def get_multifile_scenarios_no_diff(err_files):
         """Create tests to verify that commands are handling both err.c/err.cpp as input correctly and that --no-diff disables diff output."""
         expected_err = b""
-        unc_defaults_path = os.path.join(os.getcwd(), "tests", "uncrustify_defaults.cfg")
         scenarios = [
             [ClangFormatCmd, ["--style=google", "--no-diff"], err_files, expected_err, 1],
-            [UncrustifyCmd, ["-c", unc_defaults_path, "--no-diff"], err_files, expected_err, 1],
+            [UncrustifyCmd, ["-c", _UNC_DEFAULTS_PATH, "--no-diff"], err_files, expected_err, 1],
         ]
         return scenarios
 
@@ -124,14 +192,8 @@ class GeneratorT:
         # Run normal, plus two in-place arguments
         additional_args = [[], ["-fix"], ["--fix-errors"], ["--", "-std=c18"]]
         clang_tidy_args_sets = [ct_base_args + arg for arg in additional_args]
-        clang_tidy_err_str = """{0}:2:18: error: non-void function 'main' should return a value [clang-diagnostic-return-type]
-int main(){{int i;return;}}
-                 ^
-1 error generated.
-Error while processing {0}.
-"""  # noqa: E501
-        clang_tidy_str_c = clang_tidy_err_str.format(cls.err_c, "").encode()
-        clang_tidy_str_cpp = clang_tidy_err_str.format(cls.err_cpp).encode()
+        clang_tidy_str_c = _CLANG_TIDY_ERR.format(cls.err_c, "").encode()
+        clang_tidy_str_cpp = _CLANG_TIDY_ERR.format(cls.err_cpp).encode()
         clang_tidy_output = [b"", b"", clang_tidy_str_c, clang_tidy_str_cpp]
         scenarios = []
         for i in range(len(cls.files)):
@@ -151,13 +213,10 @@ Error while processing {0}.
         # cppcheck adds unnecessary error information.
         # See https://stackoverflow.com/questions/6986033
         if cls.versions["cppcheck"] <= "1.88":
-            cppcheck_err = "[{}:1]: (style) Unused variable: i\n"
+            cppcheck_err = _CPPCHECK_ERR_1_88
         # They've made changes to messaging
         elif cls.versions["cppcheck"] >= "1.89":
-            cppcheck_err = """{}:2:16: style: Unused variable: i [unusedVariable]
-int main(){{int i;return;}}
-               ^
-"""
+            cppcheck_err = _CPPCHECK_ERR
         else:
             print("Problem parsing version for cppcheck", cls.versions["cppcheck"])
             print("Please create an issue on github.com/pocc/pre-commit-hooks")
@@ -175,17 +234,8 @@ int main(){{int i;return;}}
     @classmethod
     def generate_cpplint_tests(cls):
         cpplint_arg_sets = [["--verbose=0", "--quiet"]]
-        cpplint_err_str = """\
-Done processing {0}
-Total errors found: 5
-{0}:0:  No copyright message found.  You should have a line: "Copyright [year] <Copyright Owner>"  [legal/copyright] [5]
-{0}:2:  More than one command on the same line  [whitespace/newline] [0]
-{0}:2:  Missing space after ;  [whitespace/semicolon] [3]
-{0}:2:  Missing space before {{  [whitespace/braces] [5]
-{0}:2:  Could not find a newline character at the end of the file.  [whitespace/ending_newline] [5]
-"""
-        cpplint_err_c = cpplint_err_str.format(cls.err_c).encode()
-        cpplint_err_cpp = cpplint_err_str.format(cls.err_cpp).encode()
+        cpplint_err_c = _CPPLINT_ERR.format(cls.err_c).encode()
+        cpplint_err_cpp = _CPPLINT_ERR.format(cls.err_cpp).encode()
         cpplint_output = [b"", b"", cpplint_err_c, cpplint_err_cpp]
         scenarios = []
         for i in range(len(cls.files)):
@@ -197,34 +247,8 @@ Total errors found: 5
     @classmethod
     def generate_iwyu_tests(cls):
         iwyu_arg_sets = [[]]
-        iwyu_err_c = """{0}:2:18: error: non-void function 'main' should return a value [-Wreturn-type]
-int main(){{int i;return;}}
-                 ^
-
-{0} should add these lines:
-
-{0} should remove these lines:
-- #include <stdio.h>  // lines 1-1
-
-The full include-list for {0}:
----
-""".format(
-            cls.err_c
-        ).encode()
-        iwyu_err_cpp = """{0}:2:18: error: non-void function 'main' should return a value [-Wreturn-type]
-int main(){{int i;return;}}
-                 ^
-
-{0} should add these lines:
-
-{0} should remove these lines:
-- #include <string>  // lines 1-1
-
-The full include-list for {0}:
----
-""".format(
-            cls.err_cpp
-        ).encode()
+        iwyu_err_c = _IWYU_ERR.format(cls.err_c, "<stdio.h>").encode()
+        iwyu_err_cpp = _IWYU_ERR.format(cls.err_cpp, "<string>").encode()
         iwyu_retcodes = [0, 0, 3, 3]
         iwyu_output = [b"", b"", iwyu_err_c, iwyu_err_cpp]
         scenarios = []
@@ -237,24 +261,6 @@ The full include-list for {0}:
     @classmethod
     def generate_oclint_tests(cls):
         scenarios = []
-        oclint_err = """
-Compiler Errors:
-(please be aware that these errors will prevent OCLint from analyzing this source code)
-
-{0}:2:18: non-void function 'main' should return a value
-
-Clang Static Analyzer Results:
-
-{0}:2:18: non-void function 'main' should return a value
-
-
-OCLint Report
-
-Summary: TotalFiles=0 FilesWithViolations=0 P1=0 P2=0 P3=0{1}
-
-
-[OCLint (http{2}://oclint.org) v{3}]
-"""
         # -no-analytics required because in some versions of oclint, this causes oclint to hang (0.13.1)
         # version 20+ starts using --<option> instead of -<option>
         # Link is to https://oclint.org instead of http://oclint.org in versions >= 20
@@ -265,11 +271,10 @@ Summary: TotalFiles=0 FilesWithViolations=0 P1=0 P2=0 P3=0{1}
         else:
             oclint_arg_sets = [["-enable-global-analysis", "-enable-clang-static-analyzer", "-no-analytics"]]
         oclint_arg_sets[0] += ["--", "-std=c18"]
-        ver_output = sp.check_output(["oclint", "--version"]).decode("utf-8")
-        oclint_ver = re.search(r"OCLint version ([\d.]+)\.", ver_output).group(1)
+        oclint_ver = cls.versions["oclint"]
         eol_whitespace = " "
-        oclint_err_str_c = oclint_err.format(cls.err_c, eol_whitespace, https_s, oclint_ver).encode()
-        oclint_err_str_cpp = oclint_err.format(cls.err_cpp, eol_whitespace, https_s, oclint_ver).encode()
+        oclint_err_str_c = _OCLINT_ERR.format(cls.err_c, eol_whitespace, https_s, oclint_ver).encode()
+        oclint_err_str_cpp = _OCLINT_ERR.format(cls.err_cpp, eol_whitespace, https_s, oclint_ver).encode()
         oclint_output = [b"", b"", oclint_err_str_c, oclint_err_str_cpp]
         oclint_retcodes = [0, 0, 6, 6]
         for i in range(len(cls.files)):
@@ -286,6 +291,86 @@ Summary: TotalFiles=0 FilesWithViolations=0 P1=0 P2=0 P3=0{1}
 class TestHooks:
     """Test all C Linters: clang-format, clang-tidy, and oclint."""
 
+    tmpdir = utils.get_test_dir("pre-commit-hooks-testing")
+    base_files = ["ok.c", "ok.cpp", "err.c", "err.cpp"]
+    scenarios = []
+    # (cmd_name, files, args) => (output, retcode) of shell command tests that have already been run
+    shell_outputs = {}
+    # (cmd_name, files, args) => (output, retcode) of integration tests that have already been run
+    integration_outputs = {}
+
+    @pytest.fixture(scope="class", autouse=True)
+    def setup_repos(self):
+        """Set up the test repo and the git repo that integration tests are run in.
+
+        This is a fixture rather than part of setup_class, which is also called when
+        tests are collected, so that with pytest-xdist only the worker running these
+        tests writes to the repos."""
+        utils.set_git_identity()  # set a git identity if one doesn't exist
+        test_repo_temp = os.path.join(_TEST_REPO_DIR, "temp")
+        os.makedirs(test_repo_temp, exist_ok=True)
+        os.makedirs(self.tmpdir, exist_ok=True)
+        filenames = [os.path.join(_TEST_REPO_DIR, f) for f in self.base_files]
+        utils.set_compilation_db(filenames)
+        temp_filenames = [os.path.join(self.tmpdir, f) for f in self.base_files]
+        utils.set_compilation_db(temp_filenames)
+        # initialize repo
+        utils.run_in(["git", "init"], self.tmpdir)
+        utils.run_in(["pre-commit", "install"], self.tmpdir)
+        # Stage the test files once so that pre-commit can tell when a hook modifies them.
+        # Integration tests restore the files before each run, so they always match the index.
+        for test_file in temp_filenames:
+            utils.write_test_file(test_file, utils.test_file_bytes[os.path.basename(test_file)])
+        utils.run_in(["git", "add"] + temp_filenames, self.tmpdir)
+
+    @pytest.fixture(scope="class", autouse=True)
+    def run_shell_cmds(self, request, setup_repos):
+        """Run the selected shell command tests in parallel before they are checked by test_run.
+
+        Only commands that don't change files are run this way so that they all see the same file
+        contents. oclint is excluded because each oclint-hook deletes plist files it didn't create."""
+        shell_tests = [
+            shell_test
+            for shell_test in self.get_selected_tests(request, self.run_shell_cmd)
+            if not self.determine_edit_in_place(shell_test[0], shell_test[2]) and shell_test[0] != "oclint"
+        ]
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            outputs = executor.map(lambda shell_test: self.get_shell_output(*shell_test), shell_tests)
+            for (cmd_name, files, args), output in zip(shell_tests, outputs):
+                self.shell_outputs[(cmd_name, tuple(files), tuple(args))] = output
+
+    @pytest.fixture(scope="class", autouse=True)
+    def run_integration_tests(self, request, setup_repos):
+        """Run the selected integration tests with one `pre-commit run` before they are checked by test_run.
+
+        Tests that change files are run separately as later hooks would see the changed files."""
+        integration_tests = [
+            integration_test
+            for integration_test in self.get_selected_tests(request, self.run_integration_test)
+            if not self.determine_edit_in_place(integration_test[0], integration_test[2])
+        ]
+        if not integration_tests:
+            return
+        outputs = utils.batch_integration_test(integration_tests, self.tmpdir)
+        for (cmd_name, files, args), output in zip(integration_tests, outputs):
+            # Tests whose output wasn't found are run again by themselves
+            if output is not None:
+                self.integration_outputs[(cmd_name, tuple(files), tuple(args))] = output
+
+    def get_selected_tests(self, request, test_type):
+        """Get (cmd_name, files, args) of the tests of test_type that pytest will run in this class.
+
+        Returns no tests if pytest-xdist may split this class between workers, as each worker
+        would run every test in the class ahead of time."""
+        selected_tests = []
+        if request.config.getoption("dist", "no") not in ("no", "loadscope"):
+            return selected_tests
+        for item in request.session.items:
+            params = getattr(item, "callspec", None) and item.callspec.params
+            if item.cls is type(self) and params and params["test_type"] is test_type:
+                selected_tests.append((params["cmd_name"], params["files"], params["args"]))
+        return selected_tests
+
     @classmethod
     def setup_class(cls):
         """Create test files that will be used by other tests.
@@ -299,27 +384,20 @@ class TestHooks:
         with generate_table_json() in this file.
 
         cls.run_cmd_class is redundant, but available.
+
+        pytest calls this again before running the tests, but the scenarios are only used
+        when tests are collected, so they are not generated a second time.
         """
-        utils.set_git_identity()  # set a git identity if one doesn't exist
+        if cls.scenarios:
+            return
         generator = GeneratorT()
         versions = generator.versions
         generator.generate_list_tests()
         scenarios = generator.scenarios
-        test_repo_temp = os.path.join("tests", "test_repo", "temp")
-        os.makedirs(test_repo_temp, exist_ok=True)
-        tmpdir = os.path.join(tempfile.gettempdir(), "pre-commit-hooks-testing")
-        tmpdir = os.path.realpath(tmpdir)  # sometimes the temporary directory can be a symlink
-        os.makedirs(tmpdir, exist_ok=True)
-        base_files = ["ok.c", "ok.cpp", "err.c", "err.cpp"]
-        filenames = [os.path.join("tests", "test_repo", f) for f in base_files]
-        utils.set_compilation_db(filenames)
-        temp_filenames = [os.path.join(tmpdir, f) for f in base_files]
-        utils.set_compilation_db(temp_filenames)
+        tmpdir = cls.tmpdir
         cls.scenarios = []
         for s in scenarios:
             desc = " ".join([cls.run_shell_cmd.__name__, s[0].command, " ".join(s[2]), " ".join(s[1])])
-            if os.name == "nt":
-                s[2] = [arg.replace("/", "\\\\") for arg in s[2]]
             test_scenario = [
                 desc,
                 {
@@ -333,41 +411,35 @@ class TestHooks:
                 },
             ]
             cls.scenarios += [test_scenario]
-        table_tests_integration = os.path.join("tests", "table_tests_integration.json")
-        with open(table_tests_integration) as f:
-            json_str = f.read()
-        table_tests = json.loads(json_str)
-        # initialize repo
-        utils.run_in(["git", "init"], tmpdir)
-        utils.run_in(["pre-commit", "install"], tmpdir)
-        for s in table_tests:
-            s["args"] = [arg.replace("{repo_dir}", os.getcwd()) for arg in s["args"]]
-            s["files"] = [arg.replace("{test_dir}", tmpdir) for arg in s["files"]]
-            s["expd_output"] = s["expd_output"].replace("{test_dir}", tmpdir)
-
-            if os.name == "nt":
-                s["files"] = [arg.replace("/", "\\\\") for arg in s["files"]]
+        # Test files in the json are `{test_dir}/<file>`, so the separator only has to be changed once
+        test_dir_prefix = tmpdir + ("\\\\" if os.name == "nt" else "/")
+        # The loaded tests are cached, so build new values instead of modifying them
+        for s in load_integration_tests():
+            args = [arg.replace("{repo_dir}", _CWD) for arg in s["args"]]
+            files = [arg.replace("{test_dir}/", test_dir_prefix) for arg in s["files"]]
+            expd_output = s["expd_output"].replace("{test_dir}", tmpdir)
+
             # After 20, oclint versions use double dash args
-            elif s["command"] == "oclint":
-                s["expd_output"] = s["expd_output"].replace("{oclint_ver}", versions["oclint"])
+            if s["command"] == "oclint" and os.name != "nt":
+                expd_output = expd_output.replace("{oclint_ver}", versions["oclint"])
                 if versions["oclint"] >= "20":
-                    s["args"] = [arg.replace("-enable", "--enable") for arg in s["args"]]
-                    if "-no-analytics" in s["args"]:  # no longer exists as an option
-                        s["args"].remove("-no-analytics")
+                    args = [arg.replace("-enable", "--enable") for arg in args]
+                    if "-no-analytics" in args:  # no longer exists as an option
+                        args.remove("-no-analytics")
                     # https after version 20 instead of http
-                    s["expd_output"] = s["expd_output"].replace("http://oclint.org", "https://oclint.org")
+                    expd_output = expd_output.replace("http://oclint.org", "https://oclint.org")
             desc = " ".join(
-                [cls.run_integration_test.__name__, s["command"] + "-hook", " ".join(s["files"]), " ".join(s["args"])]
+                [cls.run_integration_test.__name__, s["command"] + "-hook", " ".join(files), " ".join(args)]
             )
             test_scenario = [
                 desc,
                 {
                     "test_type": cls.run_integration_test,
                     "cmd_name": s["command"],
-                    "args": s["args"],
-                    "files": s["files"],
+                    "args": args,
+                    "files": files,
                     "test_dir": tmpdir,
-                    "expd_output": s["expd_output"].encode(),
+                    "expd_output": expd_output.encode(),
                     "expd_retcode": s["expd_retcode"],
                 },
             ]
@@ -385,14 +457,12 @@ class TestHooks:
         """Test each command's class from its python file
         and the command for each generated by setup.py."""
         fix_in_place = self.determine_edit_in_place(cmd_name, args)
-        has_err_file = any(["err.c" in f for f in files])
+        has_err_file = any("err.c" in f for f in files)
         will_fix_in_place = fix_in_place and has_err_file
         test_type(cmd_name, files, args, test_dir, expd_output, expd_retcode)
         if will_fix_in_place:
             for f in files:  # Restore files if they could have been changed
-                base_name = os.path.split(f)[-1]
-                with open(f, "w") as f:
-                    f.write(utils.test_file_strs[base_name])
+                utils.write_test_file(f, utils.test_file_bytes[os.path.basename(f)])
 
     @staticmethod
     def run_integration_test(cmd_name, files, args, test_dir, target_output, target_retcode):
@@ -402,7 +472,11 @@ class TestHooks:
         2. Set the .pre-commit-config.yaml in a directory with test files
         3. Run `git init; pre-commit install; git add .; git commit` against the files
         """
-        output_actual, actual_returncode = utils.integration_test(cmd_name, files, args, test_dir)
+        integration_test = (cmd_name, tuple(files), tuple(args))
+        if integration_test in TestHooks.integration_outputs:
+            output_actual, actual_returncode = TestHooks.integration_outputs.pop(integration_test)
+        else:
+            output_actual, actual_returncode = utils.integration_test(cmd_name, files, args, test_dir)
         if output_actual == b"":
             pytest.fail("pre-commit should provide output, but none found.")
 
@@ -416,13 +490,12 @@ class TestHooks:
             with open("table_test.json") as f:
                 f.write("[]")  # Empty table tests
         with open("table_tests.json") as f:
-            json_str = f.read()
-            file_tests = json.loads(json_str)
+            file_tests = json.load(f)
             # expected to be done on *nix system
             expd_output = output_actual.decode().replace("/tmp/pre-commit-testing", "{test_dir}")
             new_test = {
                 "command": command,
-                "files": [f.replace(os.getcwd(), "") for f in files],
+                "files": [f.replace(_CWD, "") for f in files],
                 "args": args,
                 "expd_output": expd_output,
                 "expd_retcode": target_retcode,
@@ -436,22 +509,30 @@ class TestHooks:
     def run_shell_cmd(cmd_name, files, args, _, target_output, target_retcode):
         """Use command generated by setup.py and installed by pip
         Ex. oclint => oclint-hook for the hook command"""
+        shell_test = (cmd_name, tuple(files), tuple(args))
+        if shell_test in TestHooks.shell_outputs:
+            actual, retcode = TestHooks.shell_outputs.pop(shell_test)
+        else:
+            actual, retcode = TestHooks.get_shell_output(cmd_name, files, args)
+        utils.assert_equal(target_output, actual)
+        assert target_retcode == retcode
+
+    @staticmethod
+    def get_shell_output(cmd_name, files, args):
+        """Run the shell hook and return its output and return code."""
         all_args = files + args
         cmd_to_run = [cmd_name + "-hook", *all_args]
-        sp_child = sp.run(cmd_to_run, stdout=sp.PIPE, stderr=sp.PIPE)
-        actual = sp_child.stdout + sp_child.stderr
+        sp_child = sp.run(cmd_to_run, stdout=sp.PIPE, stderr=sp.STDOUT)
+        actual = sp_child.stdout
         # Output is unpredictable and platform/version dependent
-        if any([f.endswith("err.cpp") for f in files]) and "-std=c++20" in args:
-            actual = re.sub(rb"[\d,]+ warnings and ", b"", actual)
-        retcode = sp_child.returncode
-        utils.assert_equal(target_output, actual)
-        assert target_retcode == retcode
+        if any(f.endswith("err.cpp") for f in files) and "-std=c++20" in args:
+            actual = utils.WARNING_COUNT_RE.sub(b"", actual)
+        return actual, sp_child.returncode
 
     @staticmethod
     def teardown_class():
         """Delete files generated by these tests."""
-        test_repo_dir = os.path.join("tests", "test_repo")
-        generated_files = [os.path.join(test_repo_dir, f) for f in ["ok.plist", "err.plist"]]
+        generated_files = [os.path.join(_TEST_REPO_DIR, f) for f in ["ok.plist", "err.plist"]]
         for filename in generated_files:
             if os.path.exists(filename):
                 os.remove(filename)
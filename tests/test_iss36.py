@@ -25,7 +25,8 @@ set_target_properties(${PROJECT_NAME} PROPERTIES OUTPUT_NAME output)
 class TestIss36:
     @classmethod
     def setup_class(cls):
-        cls.test_dir = os.path.join(tempfile.gettempdir(), "pre-commit-hooks-testing")
+        # Not shared with test_hooks.py so that both can run at the same time with pytest-xdist
+        cls.test_dir = os.path.join(tempfile.gettempdir(), "pre-commit-hooks-testing-iss36")
         cls.scenarios = [
             [
                 "Integration test for issue 36",
@@ -39,8 +40,12 @@ class TestIss36:
     def test_run(cls, expd_output, expd_retcode):
         """ See issue 36, tests cmake"""
         os.makedirs(os.path.join(cls.test_dir, "src"), exist_ok=True)
-        with open(os.path.join(cls.test_dir, "src", "ok.c"), "w") as f:
+        utils.run_in(["git", "init"], cls.test_dir)
+        ok_c = os.path.join(cls.test_dir, "src", "ok.c")
+        with open(ok_c, "w") as f:
             f.write(utils.test_file_strs["ok.c"])
+        # pre-commit only checks for changes made by hooks in tracked files
+        utils.run_in(["git", "add", ok_c], cls.test_dir)
         with open(os.path.join(cls.test_dir, "CMakeLists.txt"), "w") as f:
             f.write(CMAKELISTS)
         child = sp.run(
@@ -53,7 +58,7 @@ class TestIss36:
             pytest.fail("Problem occurred when testing iss36:" + child.stderr.decode())
         output, retcode = utils.integration_test(
             "clang-tidy",
-            [os.path.join(cls.test_dir, "src", "ok.c")],
+            [ok_c],
             ["--fix", "--quiet", "-p=cmake-build-debug"],
             cls.test_dir,
         )
@@ -1,19 +1,28 @@
 #!/usr/bin/env python3
 import difflib
+import functools
 import os
 import re
 import shutil
 import subprocess as sp
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
+# pre-commit first run info lines
+PRE_COMMIT_INFO_RE = re.compile(rb"\[(?:INFO|WARNING)\].*\n")
+# Warning counts are unpredictable and platform/version dependent
+WARNING_COUNT_RE = re.compile(rb"[\d,]+ warnings and ")
+
 test_file_strs = {
     "ok.c": '// Copyright 2021 Ross Jacobs\n#include <stdio.h>\n\nint main() {\n  printf("Hello World!\\n");\n  return 0;\n}\n',
     "ok.cpp": '// Copyright 2021 Ross Jacobs\n#include <iostream>\n\nint main() {\n  std::cout << "Hello World!\\n";\n  return 0;\n}\n',
     "err.c": "#include <stdio.h>\nint main(){int i;return;}",
     "err.cpp": "#include <string>\nint main(){int i;return;}",
 }
+test_file_bytes = {name: text.encode() for name, text in test_file_strs.items()}
 
 
 def assert_equal(expected: bytes, actual: bytes):
@@ -34,32 +43,40 @@ def assert_equal(expected: bytes, actual: bytes):
         pytest.fail("Test failed!")
 
 
+@functools.lru_cache(maxsize=1)
 def get_versions():
-    """Returns a dict of commands and their versions."""
+    """Returns a dict of commands and their versions.
+
+    Cached as several test classes need it, and the commands are run in parallel."""
     commands = ["clang-format", "clang-tidy", "uncrustify", "cppcheck", "cpplint"]
     if os.name != "nt":  # oclint doesn't work on windows, iwyu needs to be compiled on windows
         commands += ["oclint", "include-what-you-use"]
-    # Regex for all versions. Unit tests: https://regex101.com/r/rzJE0I/1
-    regex = r"[- ]((?:\d+\.)+\d+[_+\-a-z\d]*)(?![\s\S]*OCLint version)"
-    versions = {}
     for cmd in commands:
         if not shutil.which(cmd):
             sys.exit("Command " + cmd + " not found.")
-        cmds = [cmd, "--version"]
-        child = sp.run(cmds, stdout=sp.PIPE, stderr=sp.PIPE)
-        if len(child.stderr) > 0:
-            print(f"Received error when running {cmds}:\n{child.stderr}")
-            sys.exit(1)
-        output = child.stdout.decode("utf-8")
-        try:
-            versions[cmd] = re.search(regex, output).group(1)
-        except AttributeError:
-            print(f"Received `{output}`. Version regexes have broken.")
-            print("Please file a bug (github.com/pocc/pre-commit-hooks).")
-            sys.exit(1)
+    with ThreadPoolExecutor(max_workers=len(commands)) as executor:
+        versions = dict(zip(commands, executor.map(get_version, commands)))
     return versions
 
 
+def get_version(cmd):
+    """Returns the version of a command."""
+    # Regex for all versions. Unit tests: https://regex101.com/r/rzJE0I/1
+    regex = r"[- ]((?:\d+\.)+\d+[_+\-a-z\d]*)(?![\s\S]*OCLint version)"
+    cmds = [cmd, "--version"]
+    child = sp.run(cmds, stdout=sp.PIPE, stderr=sp.PIPE)
+    if len(child.stderr) > 0:
+        print(f"Received error when running {cmds}:\n{child.stderr}")
+        sys.exit(1)
+    output = child.stdout.decode("utf-8")
+    try:
+        return re.search(regex, output).group(1)
+    except AttributeError:
+        print(f"Received `{output}`. Version regexes have broken.")
+        print("Please file a bug (github.com/pocc/pre-commit-hooks).")
+        sys.exit(1)
+
+
 # Required for testing with clang-tidy and oclint
 def set_compilation_db(filenames):
     """Create a compilation database for clang static analyzers."""
@@ -82,8 +99,8 @@ def set_compilation_db(filenames):
     # Required for clang-tidy
     if os.name == "nt":
         cdb = cdb.replace("\\", "\\\\").replace("Program Files", 'Program\\" \\"Files')
-    with open(os.path.join(file_dir, "compile_commands.json"), "w") as f:
-        f.write(cdb)
+    # Both test repos need a compilation database, but it only has to be written once
+    write_test_file(os.path.join(file_dir, "compile_commands.json"), cdb.encode())
 
 
 def set_git_identity():
@@ -104,36 +121,111 @@ def run_in(commands, tmpdir):
         pytest.fail(err_msg)
 
 
+def get_test_dir(name):
+    """Get the path of a temporary test directory.
+    On Linux, use /dev/shm if it exists so test files are kept in memory."""
+    temp_root = tempfile.gettempdir()
+    if sys.platform == "linux" and os.path.isdir("/dev/shm"):
+        temp_root = "/dev/shm"
+    # sometimes the temporary directory can be a symlink
+    return os.path.realpath(os.path.join(temp_root, name))
+
+
+def write_test_file(filename, contents):
+    """Write bytes to a test file unless it already contains them."""
+    if os.path.exists(filename):
+        with open(filename, "rb") as fd:
+            if fd.read() == contents:
+                return
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, contents)
+    finally:
+        os.close(fd)
+
+
 def integration_test(cmd_name, files, args, test_dir):
     for test_file in files:
-        test_file_base = os.path.split(test_file)[-1]
-        if test_file_base in test_file_strs:
-            with open(test_file, "w") as fd:
-                fd.write(test_file_strs[test_file_base])
-    # Add only the files we are testing
-    run_in(["git", "reset"], test_dir)
-    run_in(["git", "add"] + files, test_dir)
+        test_file_base = os.path.basename(test_file)
+        if test_file_base in test_file_bytes:
+            write_test_file(test_file, test_file_bytes[test_file_base])
     args = list(args)  # redeclare so there's no memory weirdness
+    write_pre_commit_config(test_dir, [(cmd_name, args, None)])
+
+    # Run only on the files we are testing. --files doesn't need them to be staged.
+    # Using git commit can cause hangs if pre-commit passes
+    sp_child = sp.run(["pre-commit", "run", "--files", *files], cwd=test_dir, stdout=sp.PIPE, stderr=sp.STDOUT)
+    # Get rid of pre-commit first run info lines
+    output_actual = PRE_COMMIT_INFO_RE.sub(b"", sp_child.stdout)
+    # Output is unpredictable and platform/version dependent
+    if any(f.endswith("err.cpp") for f in files) and "-std=c++20" in args:
+        output_actual = WARNING_COUNT_RE.sub(b"", output_actual)
+
+    return output_actual, sp_child.returncode
+
+
+def batch_integration_test(integration_tests, test_dir):
+    """Run several integration tests, given as (cmd_name, files, args), with one `pre-commit run`.
+
+    Each test is a hook in the same .pre-commit-config.yaml that only runs on its files.
+    The output is split per hook, so hooks must not edit files that later hooks check.
+    Returns the (output, retcode) of each test, where retcode is what pre-commit would return
+    if the hook had been run by itself, or None if the hook's output was not found."""
+    all_files = []
+    hooks = []
+    for cmd_name, files, args in integration_tests:
+        all_files += [f for f in files if f not in all_files]
+        rel_files = [os.path.relpath(f, test_dir).replace(os.sep, "/") for f in files]
+        files_regex = "^({})$".format("|".join(re.escape(f) for f in rel_files))
+        hooks.append((cmd_name, list(args), files_regex))
+    for test_file in all_files:
+        test_file_base = os.path.basename(test_file)
+        if test_file_base in test_file_bytes:
+            write_test_file(test_file, test_file_bytes[test_file_base])
+    write_pre_commit_config(test_dir, hooks)
+
+    sp_child = sp.run(["pre-commit", "run", "--files", *all_files], cwd=test_dir, stdout=sp.PIPE, stderr=sp.STDOUT)
+    output = PRE_COMMIT_INFO_RE.sub(b"", sp_child.stdout)
+    # Find where each hook's output starts. Hooks are run in the order of the config.
+    starts = []
+    search_pos = 0
+    for cmd_name, _, _ in integration_tests:
+        header_re = re.compile(rb"^" + re.escape(cmd_name.encode()) + rb"\.{3,}", re.MULTILINE)
+        header = header_re.search(output, search_pos)
+        starts.append(header.start() if header else None)
+        if header:
+            search_pos = header.start() + 1
+    results = []
+    for i, (cmd_name, files, args) in enumerate(integration_tests):
+        if starts[i] is None:
+            results.append(None)
+            continue
+        end = next((start for start in starts[i + 1 :] if start is not None), len(output))
+        output_actual = output[starts[i] : end]
+        # Output is unpredictable and platform/version dependent
+        if any(f.endswith("err.cpp") for f in files) and "-std=c++20" in args:
+            output_actual = WARNING_COUNT_RE.sub(b"", output_actual)
+        header_line = output_actual.split(b"\n", 1)[0].rstrip(b"\r")
+        retcode = 1 if header_line.endswith(b"Failed") else 0
+        results.append((output_actual, retcode))
+    return results
+
+
+def write_pre_commit_config(test_dir, hooks):
+    """Write a .pre-commit-config.yaml using this repo's hooks, given as (cmd_name, args, files_regex)."""
     pre_commit_config_path = os.path.join(test_dir, ".pre-commit-config.yaml")
-    pre_commit_config = f"""\
+    pre_commit_config = """\
 repos:
 - repo: https://github.com/pocc/pre-commit-hooks
   rev: v1.3.4
   hooks:
+"""
+    for cmd_name, args, files_regex in hooks:
+        pre_commit_config += f"""\
     - id: {cmd_name}
       args: {args}
 """
+        if files_regex:
+            pre_commit_config += f"      files: '{files_regex}'\n"
     with open(pre_commit_config_path, "w") as f:
         f.write(pre_commit_config)
-
-    # Pre-commit run will only work on staged files, which is what we want to test
-    # Using git commit can cause hangs if pre-commit passes
-    sp_child = sp.run(["pre-commit", "run"], cwd=test_dir, stdout=sp.PIPE, stderr=sp.PIPE)
-    output_actual = sp_child.stderr + sp_child.stdout
-    # Get rid of pre-commit first run info lines
-    output_actual = re.sub(rb"\[(?:INFO|WARNING)\].*\n", b"", output_actual)
-    # Output is unpredictable and platform/version dependent
-    if any([f.endswith("err.cpp") for f in files]) and "-std=c++20" in args:
-        output_actual = re.sub(rb"[\d,]+ warnings and ", b"", output_actual)
-
-    return output_actual, sp_child.returncode